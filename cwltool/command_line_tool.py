@@ -12,9 +12,11 @@ import shutil
 import threading
 import urllib
 import urllib.parse
+import uuid
 from collections.abc import Generator, Mapping, MutableMapping, MutableSequence
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from functools import cmp_to_key, partial
+from functools import partial
 from re import Pattern
 from typing import TYPE_CHECKING, Any, Optional, TextIO, Union, cast
 
@@ -59,10 +61,10 @@ from .utils import (
     DirectoryType,
     JobsGeneratorType,
     OutputCallbackType,
-    adjustDirObjs,
     adjustFileObjs,
     aslist,
     get_listing,
+    normalize_file_dir,
     normalizeFilesDirs,
     random_outdir,
     shared_file_lock,
@@ -233,6 +235,39 @@ def remove_path(f: CWLObjectType) -> None:
         del f["path"]
 
 
+def _copy_cwl_objects(obj: Any) -> Any:
+    """
+    Copy the mappings and sequences of a CWL object tree.
+
+    Cheaper than :py:func:`copy.deepcopy` for JSON-like data: the
+    (immutable) scalar leaves are shared instead of copied.
+    """
+    if isinstance(obj, MutableMapping):
+        return {k: _copy_cwl_objects(v) for k, v in obj.items()}
+    if isinstance(obj, MutableSequence):
+        return [_copy_cwl_objects(v) for v in obj]
+    return obj
+
+
+_URI_SAFE_PATH_RE = re.compile(r"^/(?!/)[\w.~/-]*$", re.ASCII)
+
+
+def _file_uri(path: str) -> str:
+    """:py:func:`schema_salad.ref_resolver.file_uri` with a fast path for plain paths."""
+    if _URI_SAFE_PATH_RE.match(path):
+        # nothing to quote
+        return "file://" + path
+    return file_uri(path)
+
+
+def _uri_file_path(uri: str) -> str:
+    """:py:func:`schema_salad.ref_resolver.uri_file_path` with a fast path for plain URIs."""
+    if uri.startswith("file:///") and not any(c in uri for c in "%?#"):
+        # nothing to unquote and no query or fragment to split off
+        return uri[7:]
+    return uri_file_path(uri)
+
+
 def revmap_file(builder: Builder, outdir: str, f: CWLObjectType) -> Optional[CWLObjectType]:
     """
     Remap a file from internal path to external path.
@@ -246,7 +281,7 @@ def revmap_file(builder: Builder, outdir: str, f: CWLObjectType) -> Optional[CWL
 
     if outdir.startswith("/"):
         # local file path, turn it into a file:// URI
-        outdir = file_uri(outdir)
+        outdir = _file_uri(outdir)
 
     # note: outer outdir should already be a URI and should not be URI
     # quoted any further.
@@ -254,7 +289,7 @@ def revmap_file(builder: Builder, outdir: str, f: CWLObjectType) -> Optional[CWL
     if "location" in f and "path" not in f:
         location = cast(str, f["location"])
         if location.startswith("file://"):
-            f["path"] = uri_file_path(location)
+            f["path"] = _uri_file_path(location)
         else:
             f["location"] = builder.fs_access.join(outdir, cast(str, f["location"]))
             return f
@@ -264,7 +299,7 @@ def revmap_file(builder: Builder, outdir: str, f: CWLObjectType) -> Optional[CWL
 
     if "path" in f:
         path = builder.fs_access.join(builder.outdir, cast(str, f["path"]))
-        uripath = file_uri(path)
+        uripath = _file_uri(path)
         del f["path"]
 
         if "basename" not in f:
@@ -278,17 +313,9 @@ def revmap_file(builder: Builder, outdir: str, f: CWLObjectType) -> Optional[CWL
 
         if revmap_f and not builder.pathmapper.mapper(revmap_f[0]).type.startswith("Writable"):  # type: ignore[union-attr]
             f["location"] = revmap_f[1]
-        elif (
-            uripath == outdir
-            or uripath.startswith(outdir + os.sep)
-            or uripath.startswith(outdir + "/")
-        ):
+        elif uripath == outdir or uripath.startswith(outdir + "/"):
             f["location"] = uripath
-        elif (
-            path == builder.outdir
-            or path.startswith(builder.outdir + os.sep)
-            or path.startswith(builder.outdir + "/")
-        ):
+        elif path == builder.outdir or path.startswith(builder.outdir + "/"):
             joined_path = builder.fs_access.join(
                 outdir, urllib.parse.quote(path[len(builder.outdir) + 1 :])
             )
@@ -305,6 +332,117 @@ def revmap_file(builder: Builder, outdir: str, f: CWLObjectType) -> Optional[CWL
     )
 
 
+def compute_cachekey(keydict: Mapping[str, Any]) -> str:
+    """
+    Compute the job cache key for a key dictionary.
+
+    The digest is identical to hashing the compact, key-sorted JSON
+    serialization of ``keydict``, but each top-level entry is serialized
+    and fed to the hasher separately so the whole document is never held
+    in memory at once.
+    """
+    checksum = hashlib.blake2b(digest_size=16)  # nosec
+    separator = b"{"
+    for key in sorted(keydict):
+        checksum.update(separator)
+        checksum.update(json_dumps(key).encode("utf-8"))
+        checksum.update(b":")
+        checksum.update(
+            json_dumps(keydict[key], separators=(",", ":"), sort_keys=True).encode("utf-8")
+        )
+        separator = b","
+    checksum.update(b"}" if keydict else b"{}")
+    return checksum.hexdigest()
+
+
+_INPUT_CHECKSUMS_MAX = 4096
+
+_input_checksums: dict[tuple[str, int, int, int, int], str] = {}
+"""
+Checksums of local input files, keyed by path and identifying stat fields.
+
+Kept in least recently used order and limited to ``_INPUT_CHECKSUMS_MAX``
+entries, so it does not grow for the lifetime of a long-running process.
+"""
+_input_checksums_lock = threading.Lock()
+
+
+def checksum_input(fs_access: StdFsAccess, fileobj: CWLObjectType) -> None:
+    """
+    Add a checksum to an input File object for computing the job cache key.
+
+    Like :py:func:`cwltool.process.compute_checksums`, but the digest of a
+    local file is remembered for later jobs. It is reused as long as the
+    file's device, inode, size and modification time are unchanged, so an
+    input shared by many steps is only read once.
+    """
+    location = cast(str, fileobj["location"])
+    if "checksum" in fileobj or "contents" in fileobj or not location.startswith("file://"):
+        compute_checksums(fs_access, fileobj)
+        return
+    path = _uri_file_path(location)
+    try:
+        st = os.stat(path)
+    except OSError:
+        compute_checksums(fs_access, fileobj)
+        return
+    key = (path, st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    with _input_checksums_lock:
+        checksum = _input_checksums.pop(key, None)
+        if checksum is not None:
+            _input_checksums[key] = checksum
+    if checksum is None:
+        compute_checksums(fs_access, fileobj)
+        with _input_checksums_lock:
+            _input_checksums[key] = cast(str, fileobj["checksum"])
+            while len(_input_checksums) > _INPUT_CHECKSUMS_MAX:
+                del _input_checksums[next(iter(_input_checksums))]
+    else:
+        fileobj["checksum"] = checksum
+        fileobj["size"] = st.st_size
+
+
+_CHECKSUM_BLOCK_SIZE = 4 * 1024 * 1024
+
+# hashlib.file_digest is only available on Python 3.11 and later.
+_file_digest = getattr(hashlib, "file_digest", None)
+
+
+def _compute_sha1(fs_access: StdFsAccess, location: str) -> str:
+    """
+    Return the ``sha1$``-prefixed checksum of the file at the given location.
+
+    Files that support ``readinto`` are hashed without allocating a new
+    buffer per block: by :py:func:`hashlib.file_digest` where available,
+    otherwise by reading into a single reused buffer.
+    """
+    with fs_access.open(location, "rb") as f:
+        if hasattr(f, "readinto"):
+            if _file_digest is not None:
+                return "sha1$%s" % _file_digest(f, "sha1").hexdigest()  # nosec
+            checksum = hashlib.sha1()  # nosec
+            buf = memoryview(bytearray(_CHECKSUM_BLOCK_SIZE))
+            size = f.readinto(buf)
+            while size:
+                checksum.update(buf[:size])
+                size = f.readinto(buf)
+        else:
+            checksum = hashlib.sha1()  # nosec
+            contents = f.read(_CHECKSUM_BLOCK_SIZE)
+            while contents != b"":
+                checksum.update(contents)
+                contents = f.read(_CHECKSUM_BLOCK_SIZE)
+    return "sha1$%s" % checksum.hexdigest()
+
+
+def _checksum_and_size(
+    fs_access: StdFsAccess, compute_checksum: bool, location: str, size: Optional[int]
+) -> tuple[Optional[str], int]:
+    """Return the checksum (if requested) and the size (unless known) of an output file."""
+    checksum = _compute_sha1(fs_access, location) if compute_checksum else None
+    return checksum, size if size is not None else fs_access.size(location)
+
+
 @mypyc_attr(serializable=True)
 class CallbackJob:
     """Callback Job class, used by :py:func:`CommandLineTool.job`."""
@@ -347,9 +485,10 @@ def check_adjust(accept_re: Pattern[str], builder: Builder, file_o: CWLObjectTyp
     We need to also explicitly walk over input, as implicit reassignment
     doesn't reach everything in builder.bindings
     """
-    if not builder.pathmapper:
+    pathmapper = builder.pathmapper
+    if not pathmapper:
         raise ValueError("Do not call check_adjust using a builder that doesn't have a pathmapper.")
-    file_o["path"] = path = builder.pathmapper.mapper(cast(str, file_o["location"]))[1]
+    file_o["path"] = path = pathmapper.mapper(cast(str, file_o["location"]))[1]
     basename = cast(str, file_o.get("basename"))
     dn, bn = os.path.split(path)
     if file_o.get("dirname") != dn:
@@ -362,20 +501,43 @@ def check_adjust(accept_re: Pattern[str], builder: Builder, file_o: CWLObjectTyp
             file_o["nameroot"] = str(nr)
         if file_o.get("nameext") != ne:
             file_o["nameext"] = str(ne)
-    if not accept_re.match(basename):
+    # the relaxed pattern accepts anything, don't bother running it
+    if accept_re is not PathCheckingMode.RELAXED.value and not accept_re.match(basename):
         raise WorkflowException(
             f"Invalid filename: {file_o['basename']!r} contains illegal characters"
         )
     return file_o
 
 
+def _relocate_output(
+    builder: Builder, outdir: str, collected: list[CWLObjectType], obj: CWLObjectType
+) -> None:
+    """
+    Prepare a single File or Directory of an output record.
+
+    Trims the listing of a local Directory, maps the object to its location
+    outside of the job, removes its ``path``, normalizes it, and appends it
+    to ``collected``. Each step only touches this object, so applying them
+    all during one walk of the record gives the same result as one walk
+    per step.
+    """
+    if obj["class"] == "Directory":
+        trim_listing(cast(dict[str, Any], obj))
+    revmap_file(builder, outdir, obj)
+    remove_path(obj)
+    normalize_file_dir(obj)
+    collected.append(obj)
+
+
 def check_valid_locations(fs_access: StdFsAccess, ob: CWLObjectType) -> None:
     location = cast(str, ob["location"])
     if location.startswith("_:"):
         pass
-    if ob["class"] == "File" and not fs_access.isfile(location):
-        raise ValidationException("Does not exist or is not a File: '%s'" % location)
-    if ob["class"] == "Directory" and not fs_access.isdir(location):
+    cls = ob["class"]
+    if cls == "File":
+        if not fs_access.isfile(location):
+            raise ValidationException("Does not exist or is not a File: '%s'" % location)
+    elif cls == "Directory" and not fs_access.isdir(location):
         raise ValidationException("Does not exist or is not a Directory: '%s'" % location)
 
 
@@ -403,6 +565,12 @@ class CommandLineTool(Process):
             if loadingContext.relax_path_checks
             else PathCheckingMode.STRICT
         )
+        self.output_shortnames: dict[str, str] = {
+            port["id"]: shortname(port["id"]) for port in self.tool["outputs"]
+        }
+        self.outputs_record_avro_schema = cast(
+            Schema, self.names.get_name("outputs_record_schema", None)
+        )
 
     def make_job_runner(self, runtimeContext: RuntimeContext) -> type[JobBase]:
         """Return the correct CommandLineJob class given the container settings."""
@@ -474,25 +642,46 @@ class CommandLineTool(Process):
 
     def updatePathmap(self, outdir: str, pathmap: PathMapper, fn: CWLObjectType) -> None:
         """Update a PathMapper with a CWL File or Directory object."""
-        if not isinstance(fn, MutableMapping):
-            raise WorkflowException("Expected File or Directory object, was %s" % type(fn))
-        basename = cast(str, fn["basename"])
-        if "location" in fn:
-            location = cast(str, fn["location"])
-            if location in pathmap:
-                pathmap.update(
-                    location,
-                    pathmap.mapper(location).resolved,
-                    os.path.join(outdir, basename),
-                    ("Writable" if fn.get("writable") else "") + cast(str, fn["class"]),
-                    False,
-                )
-        for sf in cast(list[CWLObjectType], fn.get("secondaryFiles", [])):
-            self.updatePathmap(outdir, pathmap, sf)
-        for ls in cast(list[CWLObjectType], fn.get("listing", [])):
-            self.updatePathmap(os.path.join(outdir, cast(str, fn["basename"])), pathmap, ls)
-
-    def _initialworkdir(self, j: JobBase, builder: Builder) -> None:
+        # Walk the secondaryFiles and listings depth-first with an explicit
+        # stack, visiting the entries in the same order as a recursive walk.
+        stack: list[tuple[str, CWLObjectType]] = [(outdir, fn)]
+        while stack:
+            outdir, fn = stack.pop()
+            if not isinstance(fn, MutableMapping):
+                raise WorkflowException("Expected File or Directory object, was %s" % type(fn))
+            basename = cast(str, fn["basename"])
+            if "location" in fn:
+                location = cast(str, fn["location"])
+                if location in pathmap:
+                    pathmap.update(
+                        location,
+                        pathmap.mapper(location).resolved,
+                        os.path.join(outdir, basename),
+                        ("Writable" if fn.get("writable") else "") + cast(str, fn["class"]),
+                        False,
+                    )
+            if "listing" in fn:
+                inner_outdir = os.path.join(outdir, basename)
+                for ls in reversed(cast(list[CWLObjectType], fn["listing"])):
+                    stack.append((inner_outdir, ls))
+            for sf in reversed(cast(list[CWLObjectType], fn.get("secondaryFiles", []))):
+                stack.append((outdir, sf))
+
+    def _initialworkdir(
+        self,
+        j: JobBase,
+        builder: Builder,
+        file_dir_objs: Optional[list[CWLObjectType]] = None,
+    ) -> None:
+        """
+        Stage the InitialWorkDirRequirement listing, if any.
+
+        Afterwards the File and Directory objects in ``builder.files`` and
+        ``builder.bindings`` are mapped again, as the listing may have moved
+        some of them. If ``file_dir_objs`` (those same objects, already
+        collected by the caller) is provided it is used instead of walking
+        the inputs again.
+        """
         initialWorkdir, _ = self.get_requirement("InitialWorkDirRequirement")
         if initialWorkdir is None:
             return
@@ -625,30 +814,6 @@ class CommandLineTool(Process):
                             ls.extend(cast(list[CWLObjectType], entry))
                             continue
 
-                    et: CWLObjectType = {}
-                    if isinstance(entry, Mapping) and entry.get("class") in (
-                        "File",
-                        "Directory",
-                    ):
-                        et["entry"] = cast(CWLOutputType, entry)
-                    else:
-                        if isinstance(entry, str):
-                            et["entry"] = entry
-                        else:
-                            if classic_dirent:
-                                raise SourceLine(t, "entry", WorkflowException, debug).makeError(
-                                    "'entry' expression resulted in "
-                                    "something other than number, object or "
-                                    "array besides a single File or Dirent object. "
-                                    "In CWL v1.2+ this would be serialized to a JSON object. "
-                                    "However this is a {cwl_version} document. "
-                                    "If that is the desired result then please "
-                                    "consider using 'cwl-upgrader' to upgrade "
-                                    "your document to CWL version 1.2. "
-                                    f"Result of {entry_field!r} was {entry!r}."
-                                )
-                            et["entry"] = json_dumps(entry, sort_keys=True)
-
                     if "entryname" in t:
                         entryname_field = cast(str, t["entryname"])
                         if "${" in entryname_field or "$(" in entryname_field:
@@ -660,13 +825,54 @@ class CommandLineTool(Process):
                                     "'entryname' expression must result a string. "
                                     f"Got {en!r} from {entryname_field!r}"
                                 )
-                            et["entryname"] = en
+                            entryname: Optional[str] = en
                         else:
-                            et["entryname"] = entryname_field
+                            entryname = entryname_field
                     else:
-                        et["entryname"] = None
-                    et["writable"] = t.get("writable", False)
-                    ls.append(et)
+                        entryname = None
+                    writable = t.get("writable", False)
+
+                    # Build the final File or Directory object right away
+                    if isinstance(entry, Mapping) and entry.get("class") in (
+                        "File",
+                        "Directory",
+                    ):
+                        entry_obj = cast(CWLObjectType, entry)
+                        if entryname or writable:
+                            # the entry may be one of the inputs, don't modify it
+                            entry_obj = copy.deepcopy(entry_obj)
+                            if entryname:
+                                entry_obj["basename"] = entryname
+                            entry_obj["writable"] = writable
+                        ls.append(entry_obj)
+                        continue
+
+                    if not isinstance(entry, str):
+                        if classic_dirent:
+                            raise SourceLine(t, "entry", WorkflowException, debug).makeError(
+                                "'entry' expression resulted in "
+                                "something other than number, object or "
+                                "array besides a single File or Dirent object. "
+                                "In CWL v1.2+ this would be serialized to a JSON object. "
+                                "However this is a {cwl_version} document. "
+                                "If that is the desired result then please "
+                                "consider using 'cwl-upgrader' to upgrade "
+                                "your document to CWL version 1.2. "
+                                f"Result of {entry_field!r} was {entry!r}."
+                            )
+                        entry = json_dumps(entry, sort_keys=True)
+                    if not entryname:
+                        raise SourceLine(
+                            initialWorkdir, "listing", WorkflowException, debug
+                        ).makeError("Entry at index %s of listing missing entryname" % (len(ls)))
+                    ls.append(
+                        {
+                            "class": "File",
+                            "basename": entryname,
+                            "contents": entry,
+                            "writable": writable,
+                        }
+                    )
                 else:
                     # Expression, must return a Dirent, File, Directory
                     # or array of such.
@@ -684,56 +890,57 @@ class CommandLineTool(Process):
                     f"Entry at index {i} of listing is not a record, was {type(t2)}"
                 )
 
-            if "entry" not in t2:
-                continue
-
-            # Dirent
-            if isinstance(t2["entry"], str):
-                if not t2["entryname"]:
-                    raise SourceLine(initialWorkdir, "listing", WorkflowException, debug).makeError(
-                        "Entry at index %s of listing missing entryname" % (i)
-                    )
-                ls[i] = {
-                    "class": "File",
-                    "basename": t2["entryname"],
-                    "contents": t2["entry"],
-                    "writable": t2.get("writable"),
-                }
-                continue
-
-            if not isinstance(t2["entry"], Mapping):
-                raise SourceLine(initialWorkdir, "listing", WorkflowException, debug).makeError(
-                    "Entry at index {} of listing is not a record, was {}".format(
-                        i, type(t2["entry"])
-                    )
-                )
+            if "entry" in t2:
+                # Dirent returned by an expression
+                if isinstance(t2["entry"], str):
+                    if not t2.get("entryname"):
+                        raise SourceLine(
+                            initialWorkdir, "listing", WorkflowException, debug
+                        ).makeError("Entry at index %s of listing missing entryname" % (i))
+                    t2 = {
+                        "class": "File",
+                        "basename": t2["entryname"],
+                        "contents": t2["entry"],
+                        "writable": t2.get("writable"),
+                    }
+                else:
+                    if not isinstance(t2["entry"], Mapping):
+                        raise SourceLine(
+                            initialWorkdir, "listing", WorkflowException, debug
+                        ).makeError(
+                            "Entry at index {} of listing is not a record, was {}".format(
+                                i, type(t2["entry"])
+                            )
+                        )
 
-            if t2["entry"].get("class") not in ("File", "Directory"):
-                raise SourceLine(initialWorkdir, "listing", WorkflowException, debug).makeError(
-                    "Entry at index %s of listing is not a File or Directory object, was %s"
-                    % (i, t2)
-                )
+                    if t2["entry"].get("class") not in ("File", "Directory"):
+                        raise SourceLine(
+                            initialWorkdir, "listing", WorkflowException, debug
+                        ).makeError(
+                            "Entry at index %s of listing is not a File or Directory object, "
+                            "was %s" % (i, t2)
+                        )
 
-            if t2.get("entryname") or t2.get("writable"):
-                t2 = copy.deepcopy(t2)
-                t2entry = cast(CWLObjectType, t2["entry"])
-                if t2.get("entryname"):
-                    t2entry["basename"] = t2["entryname"]
-                t2entry["writable"] = t2.get("writable")
+                    if t2.get("entryname") or t2.get("writable"):
+                        t2 = copy.deepcopy(t2)
+                        t2entry = cast(CWLObjectType, t2["entry"])
+                        if t2.get("entryname"):
+                            t2entry["basename"] = t2["entryname"]
+                        t2entry["writable"] = t2.get("writable")
 
-            ls[i] = cast(CWLObjectType, t2["entry"])
+                    t2 = cast(CWLObjectType, t2["entry"])
+                ls[i] = t2
 
-        for i, t3 in enumerate(ls):
-            if t3.get("class") not in ("File", "Directory"):
+            if t2.get("class") not in ("File", "Directory"):
                 # Check that every item is a File or Directory object now
                 raise SourceLine(initialWorkdir, "listing", WorkflowException, debug).makeError(
                     f"Entry at index {i} of listing is not a Dirent, File or "
                     f"Directory object, was {t2}."
                 )
-            if "basename" not in t3:
+            if "basename" not in t2:
                 continue
-            basename = os.path.normpath(cast(str, t3["basename"]))
-            t3["basename"] = basename
+            basename = os.path.normpath(cast(str, t2["basename"]))
+            t2["basename"] = basename
             if basename.startswith("../"):
                 raise SourceLine(initialWorkdir, "listing", WorkflowException, debug).makeError(
                     f"Name {basename!r} at index {i} of listing is invalid, "
@@ -785,11 +992,16 @@ class CommandLineTool(Process):
                         remove_dirname,
                     )
 
-            visit_class(
-                [builder.files, builder.bindings],
-                ("File", "Directory"),
-                partial(check_adjust, self.path_check_mode.value, builder),
-            )
+            accept_re = self.path_check_mode.value
+            if file_dir_objs is None:
+                visit_class(
+                    [builder.files, builder.bindings],
+                    ("File", "Directory"),
+                    partial(check_adjust, accept_re, builder),
+                )
+            else:
+                for file_o in file_dir_objs:
+                    check_adjust(accept_re, builder, file_o)
 
     def job(
         self,
@@ -815,7 +1027,7 @@ class CommandLineTool(Process):
             )
             _check_adjust = partial(check_adjust, self.path_check_mode.value, cachebuilder)
             _checksum = partial(
-                compute_checksums,
+                checksum_input,
                 runtimeContext.make_fs_access(runtimeContext.basedir),
             )
             visit_class(
@@ -846,16 +1058,10 @@ class CommandLineTool(Process):
                 if shortcut in self.tool:
                     keydict[shortcut] = self.tool[shortcut]
 
-            def calc_checksum(location: str) -> Optional[str]:
-                for e in cachebuilder.files:
-                    if (
-                        "location" in e
-                        and e["location"] == location
-                        and "checksum" in e
-                        and e["checksum"] != "sha1$hash"
-                    ):
-                        return cast(str, e["checksum"])
-                return None
+            checksums: dict[str, str] = {}
+            for e in cachebuilder.files:
+                if "location" in e and "checksum" in e and e["checksum"] != "sha1$hash":
+                    checksums.setdefault(cast(str, e["location"]), cast(str, e["checksum"]))
 
             def remove_prefix(s: str, prefix: str) -> str:
                 # replace with str.removeprefix when Python 3.9+
@@ -863,7 +1069,7 @@ class CommandLineTool(Process):
 
             for location, fobj in cachebuilder.pathmapper.items():
                 if fobj.type == "File":
-                    checksum = calc_checksum(location)
+                    checksum = checksums.get(location)
                     fobj_stat = os.stat(fobj.resolved)
                     path = remove_prefix(fobj.resolved, runtimeContext.basedir + "/")
                     if checksum is not None:
@@ -887,10 +1093,11 @@ class CommandLineTool(Process):
                     if cls in interesting and cls not in keydict:
                         keydict[cls] = r
 
-            keydictstr = json_dumps(keydict, separators=(",", ":"), sort_keys=True)
-            cachekey = hashlib.md5(keydictstr.encode("utf-8")).hexdigest()  # nosec
+            cachekey = compute_cachekey(keydict)
 
-            _logger.debug("[job %s] keydictstr is %s -> %s", jobname, keydictstr, cachekey)
+            if _logger.isEnabledFor(logging.DEBUG):
+                keydictstr = json_dumps(keydict, separators=(",", ":"), sort_keys=True)
+                _logger.debug("[job %s] keydictstr is %s -> %s", jobname, keydictstr, cachekey)
 
             jobcache = os.path.join(runtimeContext.cachedir, cachekey)
 
@@ -908,7 +1115,7 @@ class CommandLineTool(Process):
             jobcachelock.seek(0)
             jobstatus = jobcachelock.read()
 
-            if os.path.isdir(jobcache) and jobstatus == "success":
+            if jobstatus == "success" and os.path.isdir(jobcache):
                 if docker_req and runtimeContext.use_container:
                     cachebuilder.outdir = runtimeContext.docker_outdir or random_outdir()
                 else:
@@ -926,7 +1133,16 @@ class CommandLineTool(Process):
                 # be writing the cache directory
                 upgrade_lock(jobcachelock)
 
-                shutil.rmtree(jobcache, True)
+                if os.path.isdir(jobcache):
+                    # Output left by an earlier, unsuccessful run: move it
+                    # aside and delete it while this job runs.
+                    stale_jobcache = f"{jobcache}.{uuid.uuid4().hex}.stale"
+                    os.rename(jobcache, stale_jobcache)
+                    threading.Thread(
+                        target=shutil.rmtree,
+                        args=(stale_jobcache, True),
+                        name="cwltool-stale-jobcache-cleanup",
+                    ).start()
                 os.makedirs(jobcache)
                 runtimeContext = runtimeContext.copy()
                 runtimeContext.outdir = jobcache
@@ -950,7 +1166,7 @@ class CommandLineTool(Process):
 
         builder = self._init_job(job_order, runtimeContext)
 
-        reffiles = copy.deepcopy(builder.files)
+        reffiles = _copy_cwl_objects(builder.files)
 
         j = self.make_job_runner(runtimeContext)(
             builder,
@@ -962,6 +1178,13 @@ class CommandLineTool(Process):
         )
         j.prov_obj = self.prov_obj
 
+        # make_job_runner() may have added a default DockerRequirement, so
+        # index the requirements only now. As in get_requirement(), later
+        # entries win and requirements take precedence over hints.
+        requirements_by_class: dict[str, CWLObjectType] = {}
+        for req in self.hints + self.requirements:
+            requirements_by_class[cast(str, req["class"])] = req
+
         j.successCodes = self.tool.get("successCodes", [])
         j.temporaryFailCodes = self.tool.get("temporaryFailCodes", [])
         j.permanentFailCodes = self.tool.get("permanentFailCodes", [])
@@ -980,11 +1203,15 @@ class CommandLineTool(Process):
         builder.pathmapper = self.make_path_mapper(reffiles, builder.stagedir, runtimeContext, True)
         builder.requirements = j.requirements
 
-        _check_adjust = partial(check_adjust, self.path_check_mode.value, builder)
-
-        visit_class([builder.files, builder.bindings], ("File", "Directory"), _check_adjust)
+        # Collect the inputs once; _initialworkdir() needs to map them again
+        # and the list saves it a second walk over the whole job order.
+        file_dir_objs: list[CWLObjectType] = []
+        visit_class([builder.files, builder.bindings], ("File", "Directory"), file_dir_objs.append)
+        accept_re = self.path_check_mode.value
+        for file_o in file_dir_objs:
+            check_adjust(accept_re, builder, file_o)
 
-        self._initialworkdir(j, builder)
+        self._initialworkdir(j, builder, file_dir_objs)
 
         if debug:
             _logger.debug(
@@ -1044,7 +1271,7 @@ class CommandLineTool(Process):
                 j.name,
                 json_dumps(builder.bindings, indent=4),
             )
-        dockerReq, _ = self.get_requirement("DockerRequirement")
+        dockerReq = requirements_by_class.get("DockerRequirement")
         if dockerReq is not None and runtimeContext.use_container:
             j.outdir = runtimeContext.get_outdir()
             j.tmpdir = runtimeContext.get_tmpdir()
@@ -1054,7 +1281,7 @@ class CommandLineTool(Process):
             j.tmpdir = builder.tmpdir
             j.stagedir = builder.stagedir
 
-        inplaceUpdateReq, _ = self.get_requirement("InplaceUpdateRequirement")
+        inplaceUpdateReq = requirements_by_class.get("InplaceUpdateRequirement")
         if inplaceUpdateReq is not None:
             j.inplace_update = cast(bool, inplaceUpdateReq["inplaceUpdate"])
         normalizeFilesDirs(j.generatefiles)
@@ -1077,18 +1304,13 @@ class CommandLineTool(Process):
 
             for li in j.generatefiles["listing"]:
                 if li.get("writable") and j.inplace_update:
-                    adjustFileObjs(li, register_mut)
-                    adjustDirObjs(li, register_mut)
+                    visit_class(li, ("File", "Directory"), register_mut)
                 else:
-                    adjustFileObjs(li, register_reader)
-                    adjustDirObjs(li, register_reader)
+                    visit_class(li, ("File", "Directory"), register_reader)
 
-            adjustFileObjs(builder.files, register_reader)
-            adjustFileObjs(builder.bindings, register_reader)
-            adjustDirObjs(builder.files, register_reader)
-            adjustDirObjs(builder.bindings, register_reader)
+            visit_class([builder.files, builder.bindings], ("File", "Directory"), register_reader)
 
-        timelimit, _ = self.get_requirement("ToolTimeLimit")
+        timelimit = requirements_by_class.get("ToolTimeLimit")
         if timelimit is not None:
             with SourceLine(timelimit, "timelimit", ValidationException, debug):
                 limit_field = cast(dict[str, Union[str, int]], timelimit)["timelimit"]
@@ -1107,7 +1329,7 @@ class CommandLineTool(Process):
                     )
                 j.timelimit = timelimit_eval
 
-        networkaccess, _ = self.get_requirement("NetworkAccess")
+        networkaccess = requirements_by_class.get("NetworkAccess")
         if networkaccess is not None:
             with SourceLine(networkaccess, "networkAccess", ValidationException, debug):
                 networkaccess_field = networkaccess["networkAccess"]
@@ -1128,7 +1350,7 @@ class CommandLineTool(Process):
 
         # Build a mapping to hold any EnvVarRequirement
         required_env = {}
-        evr, _ = self.get_requirement("EnvVarRequirement")
+        evr = requirements_by_class.get("EnvVarRequirement")
         if evr is not None:
             for eindex, t3 in enumerate(cast(list[dict[str, str]], evr["envDef"])):
                 env_value_field = t3["envValue"]
@@ -1146,7 +1368,7 @@ class CommandLineTool(Process):
         # Construct the env
         j.prepare_environment(runtimeContext, required_env)
 
-        shellcmd, _ = self.get_requirement("ShellCommandRequirement")
+        shellcmd = requirements_by_class.get("ShellCommandRequirement")
         if shellcmd is not None:
             cmd: list[str] = []
             for b in builder.bindings:
@@ -1169,7 +1391,7 @@ class CommandLineTool(Process):
         )
         j.output_callback = output_callbacks
 
-        mpi, _ = self.get_requirement(MPIRequirementName)
+        mpi = requirements_by_class.get(MPIRequirementName)
 
         if mpi is not None:
             np = cast(  # From the schema for MPIRequirement.processes
@@ -1202,6 +1424,7 @@ class CommandLineTool(Process):
         cwl_version = self.metadata.get(ORIGINAL_CWLVERSION, None)
         if cwl_version != "v1.0":
             builder.resources["exitCode"] = rcode
+        glob_results: list[CWLObjectType] = []
         try:
             fs_access = builder.make_fs_access(outdir)
             custom_output = fs_access.join(outdir, "cwl.output.json")
@@ -1216,37 +1439,68 @@ class CommandLineTool(Process):
                     )
             else:
                 for i, port in enumerate(ports):
-                    with SourceLine(
-                        ports,
-                        i,
-                        partial(ParameterOutputWorkflowException, port=port),
-                        debug,
-                    ):
-                        fragment = shortname(port["id"])
+                    try:
+                        fragment = self.output_shortnames.get(port["id"]) or shortname(port["id"])
                         ret[fragment] = self.collect_output(
                             port,
                             builder,
                             outdir,
                             fs_access,
                             compute_checksum=compute_checksum,
+                            glob_results=glob_results,
                         )
+                    except Exception as err:
+                        # Same as "with SourceLine(...)", but the SourceLine
+                        # is only built on failure.
+                        raise SourceLine(
+                            ports,
+                            i,
+                            partial(ParameterOutputWorkflowException, port=port),
+                            debug,
+                        ).makeError(str(err)) from err
             if ret:
-                revmap = partial(revmap_file, builder, outdir)
-                adjustDirObjs(ret, trim_listing)
-                visit_class(ret, ("File", "Directory"), revmap)
-                visit_class(ret, ("File", "Directory"), remove_path)
-                normalizeFilesDirs(ret)
+                file_dir_objs: list[CWLObjectType] = []
                 visit_class(
                     ret,
                     ("File", "Directory"),
-                    partial(check_valid_locations, fs_access),
+                    partial(_relocate_output, builder, outdir, file_dir_objs),
                 )
+                # Objects built from glob matches still inside the output
+                # directory were already found to exist with this class.
+                trusted = {id(obj) for obj in glob_results}
+                outdir_prefix = (_file_uri(outdir) if outdir.startswith("/") else outdir) + "/"
+                unchecked = [
+                    obj
+                    for obj in file_dir_objs
+                    if id(obj) not in trusted
+                    or not cast(str, obj["location"]).startswith(outdir_prefix)
+                ]
+                check_location = partial(check_valid_locations, fs_access)
+                remote: list[CWLObjectType] = []
+                if fs_access.concurrent_lookups:
+                    remote = [
+                        obj
+                        for obj in unchecked
+                        if not cast(str, obj["location"]).startswith("file://")
+                    ]
+                if len(remote) > 1:
+                    for file_o in unchecked:
+                        if cast(str, file_o["location"]).startswith("file://"):
+                            check_location(file_o)
+                    # Remote lookups are round trips; run them concurrently.
+                    with ThreadPoolExecutor(max_workers=min(16, len(remote))) as executor:
+                        for _ in executor.map(check_location, remote):
+                            pass
+                else:
+                    for file_o in unchecked:
+                        check_location(file_o)
 
                 if compute_checksum:
-                    adjustFileObjs(ret, partial(compute_checksums, fs_access))
-            expected_schema = cast(Schema, self.names.get_name("outputs_record_schema", None))
+                    for file_o in file_dir_objs:
+                        if file_o["class"] == "File":
+                            compute_checksums(fs_access, file_o)
             validate_ex(
-                expected_schema,
+                self.outputs_record_avro_schema,
                 ret,
                 strict=False,
                 logger=_logger_validation_warnings,
@@ -1271,7 +1525,15 @@ class CommandLineTool(Process):
         outdir: str,
         fs_access: StdFsAccess,
         compute_checksum: bool = True,
+        glob_results: Optional[list[CWLObjectType]] = None,
     ) -> Optional[CWLOutputType]:
+        """
+        Collect the value of one output parameter.
+
+        :param glob_results: if given, the objects built from glob matches
+            that the filesystem reported to be a regular file or a directory
+            are appended to it.
+        """
         r: list[CWLOutputType] = []
         empty_and_optional = False
         debug = _logger.isEnabledFor(logging.DEBUG)
@@ -1306,6 +1568,9 @@ class CommandLineTool(Process):
                                 )
                             globpatterns.extend(aslist(gb))
 
+                    known_sizes: dict[str, int] = {}
+                    known_classes: list[CWLObjectType] = []
+                    prefix_len: Optional[int] = None
                     for gb in globpatterns:
                         if gb.startswith(builder.outdir):
                             gb = gb[len(builder.outdir) + 1 :]
@@ -1314,39 +1579,44 @@ class CommandLineTool(Process):
                         elif gb.startswith("/"):
                             raise WorkflowException("glob patterns must not start with '/'")
                         try:
-                            prefix = fs_access.glob(outdir)
+                            if prefix_len is None:
+                                prefix_len = len(fs_access.glob(outdir)[0]) + 1
                             sorted_glob_result = sorted(
-                                fs_access.glob(fs_access.join(outdir, gb)),
-                                key=cmp_to_key(locale.strcoll),
+                                fs_access.glob_with_stat(fs_access.join(outdir, gb)),
+                                key=lambda match: locale.strxfrm(match[0]),
                             )
-                            r.extend(
-                                [
+                            for g, glob_class, size in sorted_glob_result:
+                                if size is not None:
+                                    known_sizes[g] = size
+                                decoded_basename = os.path.basename(urllib.parse.unquote(g))
+                                nameroot, nameext = os.path.splitext(decoded_basename)
+                                r.append(
                                     {
                                         "location": g,
                                         "path": fs_access.join(
                                             builder.outdir,
-                                            urllib.parse.unquote(g[len(prefix[0]) + 1 :]),
+                                            urllib.parse.unquote(g[prefix_len:]),
                                         ),
                                         "basename": decoded_basename,
-                                        "nameroot": os.path.splitext(decoded_basename)[0],
-                                        "nameext": os.path.splitext(decoded_basename)[1],
-                                        "class": "File" if fs_access.isfile(g) else "Directory",
+                                        "nameroot": nameroot,
+                                        "nameext": nameext,
+                                        "class": glob_class or "Directory",
                                     }
-                                    for g, decoded_basename in zip(
-                                        sorted_glob_result,
-                                        map(
-                                            lambda x: os.path.basename(urllib.parse.unquote(x)),
-                                            sorted_glob_result,
-                                        ),
-                                    )
-                                ]
-                            )
+                                )
+                                if glob_class is not None:
+                                    known_classes.append(cast(CWLObjectType, r[-1]))
                         except OSError as e:
                             _logger.warning(str(e))
                         except Exception:
                             _logger.error("Unexpected error from fs_access", exc_info=True)
                             raise
 
+                if glob_results is not None:
+                    glob_results.extend(known_classes)
+
+                output_files: list[dict[str, Optional[CWLOutputType]]] = []
+                output_locations: list[str] = []
+                output_sizes: list[Optional[int]] = []
                 for files in cast(list[dict[str, Optional[CWLOutputType]]], r):
                     rfile = files.copy()
                     revmap(rfile)
@@ -1357,18 +1627,47 @@ class CommandLineTool(Process):
                     else:
                         if binding.get("loadContents"):
                             with fs_access.open(cast(str, rfile["location"]), "rb") as f:
-                                files["contents"] = str(
-                                    content_limit_respected_read_bytes(f), "utf-8"
+                                contents = content_limit_respected_read_bytes(f)
+                            files["contents"] = str(contents, "utf-8")
+                            if compute_checksum:
+                                # The whole file has just been read, so there
+                                # is no need to open it again.
+                                files["checksum"] = (
+                                    "sha1$%s" % hashlib.sha1(contents).hexdigest()  # nosec
                                 )
-                        if compute_checksum:
-                            with fs_access.open(cast(str, rfile["location"]), "rb") as f:
-                                checksum = hashlib.sha1()  # nosec
-                                contents = f.read(1024 * 1024)
-                                while contents != b"":
-                                    checksum.update(contents)
-                                    contents = f.read(1024 * 1024)
-                                files["checksum"] = "sha1$%s" % checksum.hexdigest()
-                        files["size"] = fs_access.size(cast(str, rfile["location"]))
+                                files["size"] = len(contents)
+                                continue
+                        output_files.append(files)
+                        output_locations.append(cast(str, rfile["location"]))
+                        output_sizes.append(known_sizes.get(cast(str, files["location"])))
+
+                checksum_and_size = partial(_checksum_and_size, fs_access, compute_checksum)
+                checksum_workers = min(os.cpu_count() or 1, len(output_locations))
+                if (
+                    compute_checksum
+                    and checksum_workers > 1
+                    and (
+                        fs_access.concurrent_lookups
+                        or (
+                            type(fs_access) is StdFsAccess
+                            and all(loc.startswith("file://") for loc in output_locations)
+                        )
+                    )
+                ):
+                    # Hashing releases the GIL, so reading and hashing several
+                    # files at once overlaps I/O with computation. Other
+                    # fs_access implementations are only called from several
+                    # threads if they say that is safe.
+                    with ThreadPoolExecutor(max_workers=checksum_workers) as executor:
+                        results = list(
+                            executor.map(checksum_and_size, output_locations, output_sizes)
+                        )
+                else:
+                    results = list(map(checksum_and_size, output_locations, output_sizes))
+                for files, (checksum, size) in zip(output_files, results):
+                    if checksum is not None:
+                        files["checksum"] = checksum
+                    files["size"] = size
 
             optional = False
             single = False
@@ -1402,20 +1701,21 @@ class CommandLineTool(Process):
                         else:
                             result = cast(CWLOutputType, result[0])
 
+            primaries = aslist(result)
             if "secondaryFiles" in schema:
                 with SourceLine(schema, "secondaryFiles", WorkflowException, debug):
-                    for primary in aslist(result):
+                    secondary_files = [
+                        (sf, "$(" in sf["pattern"] or "${" in sf["pattern"])
+                        for sf in aslist(schema["secondaryFiles"])
+                    ]
+                    for primary in primaries:
                         if isinstance(primary, MutableMapping):
                             primary.setdefault("secondaryFiles", [])
-                            pathprefix = primary["path"][0 : primary["path"].rindex(os.sep) + 1]
-                            for sf in aslist(schema["secondaryFiles"]):
+                            head, sep, _ = primary["path"].rpartition(os.sep)
+                            pathprefix = head + sep
+                            for sf, pattern_is_expression in secondary_files:
                                 if "required" in sf:
-                                    with SourceLine(
-                                        schema["secondaryFiles"],
-                                        "required",
-                                        WorkflowException,
-                                        debug,
-                                    ):
+                                    try:
                                         sf_required_eval = builder.do_eval(
                                             sf["required"], context=primary
                                         )
@@ -1430,11 +1730,18 @@ class CommandLineTool(Process):
                                                 f"Got {sf_required_eval!r} for "
                                                 f"{sf['required']!r}."
                                             )
-                                        sf_required: bool = sf_required_eval or False
+                                    except Exception as err:
+                                        raise SourceLine(
+                                            schema["secondaryFiles"],
+                                            "required",
+                                            WorkflowException,
+                                            debug,
+                                        ).makeError(str(err)) from err
+                                    sf_required: bool = sf_required_eval or False
                                 else:
                                     sf_required = False
 
-                                if "$(" in sf["pattern"] or "${" in sf["pattern"]:
+                                if pattern_is_expression:
                                     sfpath = builder.do_eval(sf["pattern"], context=primary)
                                 else:
                                     sfpath = substitute(primary["basename"], sf["pattern"])
@@ -1469,7 +1776,7 @@ class CommandLineTool(Process):
             if "format" in schema:
                 format_field = cast(str, schema["format"])
                 if "$(" in format_field or "${" in format_field:
-                    for index, primary in enumerate(aslist(result)):
+                    for index, primary in enumerate(primaries):
                         format_eval = builder.do_eval(format_field, context=primary)
                         if not isinstance(format_eval, str):
                             message = (
@@ -1483,7 +1790,7 @@ class CommandLineTool(Process):
                             )
                         primary["format"] = format_eval
                 else:
-                    for primary in aslist(result):
+                    for primary in primaries:
                         primary["format"] = format_field
             # Ensure files point to local references outside of the run environment
             adjustFileObjs(result, revmap)
@@ -1505,7 +1812,12 @@ class CommandLineTool(Process):
             out = {}
             for field in cast(list[CWLObjectType], schema["type"]["fields"]):
                 out[shortname(cast(str, field["name"]))] = self.collect_output(
-                    field, builder, outdir, fs_access, compute_checksum=compute_checksum
+                    field,
+                    builder,
+                    outdir,
+                    fs_access,
+                    compute_checksum=compute_checksum,
+                    glob_results=glob_results,
                 )
             return out
         return result
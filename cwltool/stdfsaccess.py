@@ -2,11 +2,15 @@
 
 import glob
 import os
+import re
+import stat
 import urllib
-from typing import IO, Any
+from typing import IO, Any, Optional
 
 from schema_salad.ref_resolver import file_uri, uri_file_path
 
+_has_magic = re.compile(r"[*?[]").search
+
 
 def abspath(src: str, basedir: str) -> str:
     if src.startswith("file://"):
@@ -24,6 +28,16 @@ def abspath(src: str, basedir: str) -> str:
 class StdFsAccess:
     """Local filesystem implementation."""
 
+    concurrent_lookups = False
+    """
+    Whether :py:meth:`isfile`, :py:meth:`isdir`, :py:meth:`open` and
+    :py:meth:`size` may be called from several threads at once.
+
+    Subclasses for remote storage can set this to let non-local output
+    locations be checked, and output files be hashed, concurrently. Local
+    locations are always checked one at a time.
+    """
+
     def __init__(self, basedir: str) -> None:
         """Perform operations with respect to a base directory."""
         self.basedir = basedir
@@ -33,7 +47,74 @@ class StdFsAccess:
 
     def glob(self, pattern: str) -> list[str]:
         """Return a possibly empty list of absolute URI paths that match pathname."""
-        return [file_uri(str(self._abs(line))) for line in glob.glob(self._abs(pattern))]
+        abs_pattern = self._abs(pattern)
+        if not _has_magic(abs_pattern):
+            # A literal path matches itself if it exists; no directory listing needed.
+            return [file_uri(abs_pattern)] if os.path.lexists(abs_pattern) else []
+        return [file_uri(str(self._abs(line))) for line in glob.glob(abs_pattern)]
+
+    def glob_with_stat(self, pattern: str) -> list[tuple[str, Optional[str], Optional[int]]]:
+        """
+        Return the matches of :py:meth:`glob` with the class of each, and its size.
+
+        The class is ``"File"`` for a regular file, ``"Directory"`` for a
+        directory and ``None`` if it is neither or is not known (for example
+        a broken symbolic link, a FIFO, or a non-file location that
+        :py:meth:`isfile` rejects).
+
+        Local matches that share a parent directory are classified from a
+        single :py:func:`os.scandir` of that directory, and other local
+        matches from a single ``stat``, which also gives the size of a file.
+        The size is ``None`` if it is not known.
+        """
+        matches = self.glob(pattern)
+        by_parent: dict[str, dict[str, int]] = {}
+        for index, match in enumerate(matches):
+            if match.startswith("file://"):
+                parent, name = os.path.split(uri_file_path(match))
+                if name:
+                    by_parent.setdefault(parent, {})[name] = index
+        stats: list[Optional[tuple[Optional[str], Optional[int]]]] = [None] * len(matches)
+        for parent, names in by_parent.items():
+            if len(names) < 2:
+                for name, index in names.items():
+                    try:
+                        st = os.stat(os.path.join(parent, name))
+                    except OSError:
+                        stats[index] = (None, None)
+                        continue
+                    if stat.S_ISREG(st.st_mode):
+                        stats[index] = ("File", st.st_size)
+                    elif stat.S_ISDIR(st.st_mode):
+                        stats[index] = ("Directory", None)
+                    else:
+                        stats[index] = (None, None)
+                continue
+            try:
+                with os.scandir(parent) as entries:
+                    for entry in entries:
+                        index = names.get(entry.name, -1)
+                        if index < 0:
+                            continue
+                        try:
+                            if entry.is_file():
+                                stats[index] = ("File", entry.stat().st_size)
+                            elif entry.is_dir():
+                                stats[index] = ("Directory", None)
+                            else:
+                                stats[index] = (None, None)
+                        except OSError:
+                            stats[index] = (None, None)
+            except OSError:
+                pass
+        return [
+            (
+                (match, *known)
+                if known is not None
+                else (match, "File" if self.isfile(match) else None, None)
+            )
+            for match, known in zip(matches, stats)
+        ]
 
     def open(self, fn: str, mode: str) -> IO[Any]:
         return open(self._abs(fn), mode)
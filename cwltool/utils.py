@@ -391,6 +391,55 @@ def ensure_non_writable(path: str) -> None:
         os.chmod(path, mode & ~stat.S_IWUSR & ~stat.S_IWGRP & ~stat.S_IWOTH)
 
 
+def normalize_file_dir(d: MutableMapping[str, Any]) -> None:
+    """Add a location and basename to a single File or Directory object, if needed."""
+    if "location" not in d:
+        if d["class"] == "File" and ("contents" not in d):
+            raise ValidationException(
+                "Anonymous file object must have 'contents' and 'basename' fields."
+            )
+        if d["class"] == "Directory" and ("listing" not in d or "basename" not in d):
+            raise ValidationException(
+                "Anonymous directory object must have 'listing' and 'basename' fields."
+            )
+        d["location"] = "_:" + str(uuid.uuid4())
+        if "basename" not in d:
+            d["basename"] = d["location"][2:]
+
+    parse = urllib.parse.urlparse(d["location"])
+    path = parse.path
+    # strip trailing slash
+    if path.endswith("/"):
+        if d["class"] != "Directory":
+            raise ValidationException(
+                "location '%s' ends with '/' but is not a Directory" % d["location"]
+            )
+        path = path.rstrip("/")
+        d["location"] = urllib.parse.urlunparse(
+            (
+                parse.scheme,
+                parse.netloc,
+                path,
+                parse.params,
+                parse.query,
+                parse.fragment,
+            )
+        )
+
+    if not d.get("basename"):
+        if path.startswith("_:"):
+            d["basename"] = str(path[2:])
+        else:
+            d["basename"] = str(os.path.basename(urllib.request.url2pathname(path)))
+
+    if d["class"] == "File":
+        nr, ne = os.path.splitext(d["basename"])
+        if d.get("nameroot") != nr:
+            d["nameroot"] = str(nr)
+        if d.get("nameext") != ne:
+            d["nameext"] = str(ne)
+
+
 def normalizeFilesDirs(
     job: Optional[
         Union[
@@ -400,54 +449,7 @@ def normalizeFilesDirs(
         ]
     ],
 ) -> None:
-    def addLocation(d: dict[str, Any]) -> None:
-        if "location" not in d:
-            if d["class"] == "File" and ("contents" not in d):
-                raise ValidationException(
-                    "Anonymous file object must have 'contents' and 'basename' fields."
-                )
-            if d["class"] == "Directory" and ("listing" not in d or "basename" not in d):
-                raise ValidationException(
-                    "Anonymous directory object must have 'listing' and 'basename' fields."
-                )
-            d["location"] = "_:" + str(uuid.uuid4())
-            if "basename" not in d:
-                d["basename"] = d["location"][2:]
-
-        parse = urllib.parse.urlparse(d["location"])
-        path = parse.path
-        # strip trailing slash
-        if path.endswith("/"):
-            if d["class"] != "Directory":
-                raise ValidationException(
-                    "location '%s' ends with '/' but is not a Directory" % d["location"]
-                )
-            path = path.rstrip("/")
-            d["location"] = urllib.parse.urlunparse(
-                (
-                    parse.scheme,
-                    parse.netloc,
-                    path,
-                    parse.params,
-                    parse.query,
-                    parse.fragment,
-                )
-            )
-
-        if not d.get("basename"):
-            if path.startswith("_:"):
-                d["basename"] = str(path[2:])
-            else:
-                d["basename"] = str(os.path.basename(urllib.request.url2pathname(path)))
-
-        if d["class"] == "File":
-            nr, ne = os.path.splitext(d["basename"])
-            if d.get("nameroot") != nr:
-                d["nameroot"] = str(nr)
-            if d.get("nameext") != ne:
-                d["nameext"] = str(ne)
-
-    visit_class(job, ("File", "Directory"), addLocation)
+    visit_class(job, ("File", "Directory"), normalize_file_dir)
 
 
 def posix_path(local_path: str) -> str:
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import logging
 import os
@@ -6,10 +7,11 @@ import shutil
 import stat
 import subprocess
 import sys
+import threading
 import urllib.parse
 from io import StringIO
 from pathlib import Path
-from typing import Any, Union, cast
+from typing import Any, Optional, Union, cast
 
 import cwl_utils.expression as expr
 import pydot
@@ -20,15 +22,18 @@ from ruamel.yaml.comments import CommentedMap, CommentedSeq
 from schema_salad.exceptions import ValidationException
 
 import cwltool.checker
+import cwltool.command_line_tool
 import cwltool.factory
 import cwltool.pathmapper
 import cwltool.process
 import cwltool.workflow
 from cwltool.checker import can_assign_src_to_sink
+from cwltool.command_line_tool import checksum_input, compute_cachekey
 from cwltool.context import RuntimeContext
 from cwltool.errors import WorkflowException
 from cwltool.main import main
 from cwltool.process import CWL_IANA
+from cwltool.stdfsaccess import StdFsAccess
 from cwltool.utils import CWLObjectType, dedup
 
 from .util import get_data, get_main_output, needs_docker, working_directory
@@ -1212,6 +1217,23 @@ def test_secondary_files_bad_v1_1(factor: str, tmp_path: Path) -> None:
     assert error_code == 1
 
 
+def test_secondary_files_expressionlib_self(tmp_path: Path) -> None:
+    """An expressionLib function can read self, so each primary gets its own result."""
+    error_code, stdout, stderr = get_main_output(
+        [
+            "--outdir",
+            str(tmp_path),
+            get_data("tests/secondary-files-expressionlib.cwl"),
+        ]
+    )
+    assert error_code == 0, stderr
+    out = json.loads(stdout)["out"]
+    assert [(f["basename"], [sf["basename"] for sf in f["secondaryFiles"]]) for f in out] == [
+        ("a.txt", ["a.txt.idx"]),
+        ("b.txt", ["b.txt.idx"]),
+    ]
+
+
 @needs_docker
 @pytest.mark.parametrize("factor", test_factors)
 def test_secondary_files_v1_0(tmp_path: Path, factor: str) -> None:
@@ -1322,7 +1344,7 @@ def test_cache_relative_paths(tmp_path: Path, factor: str) -> None:
     assert "Output of job will be cached in" not in stderr
     assert error_code == 0, stderr
 
-    assert (tmp_path / "cwltool_cache" / "27903451fc1ee10c148a0bdeb845b2cf").exists()
+    assert (tmp_path / "cwltool_cache" / "7f3949421fcf89d418cfeb1962a8348d").exists()
 
 
 @pytest.mark.parametrize("factor", test_factors)
@@ -1347,6 +1369,169 @@ def test_cache_default_literal_file(tmp_path: Path, factor: str) -> None:
     assert error_code == 0
 
 
+def test_cache_rerun_after_failure(tmp_path: Path) -> None:
+    """Confirm that the output of an unsuccessful cached run is replaced."""
+    cache_dir = tmp_path / "cwltool_cache"
+    commands = [
+        "--out",
+        str(tmp_path / "out"),
+        "--cachedir",
+        str(cache_dir),
+        get_data("tests/wf/no-parameters-echo.cwl"),
+    ]
+    error_code, _, stderr = get_main_output(commands)
+    assert error_code == 0, stderr
+
+    (status_file,) = cache_dir.glob("*.status")
+    status_file.write_text("permanentFail")
+    jobcache = cache_dir / status_file.stem
+    (jobcache / "leftover.txt").write_text("stale")
+
+    error_code, _, stderr = get_main_output(commands)
+    stderr = re.sub(r"\s\s+", " ", stderr)
+    assert error_code == 0, stderr
+    assert "Output of job will be cached in" in stderr
+    assert status_file.read_text() == "success"
+    assert not (jobcache / "leftover.txt").exists()
+    # the replaced output is removed in the background
+    for thread in threading.enumerate():
+        if thread.name == "cwltool-stale-jobcache-cleanup":
+            thread.join(timeout=60)
+    assert not list(cache_dir.glob("*.stale"))
+
+
+def test_cache_reuse_in_process(tmp_path: Path) -> None:
+    """Confirm that a job cached earlier in the same process is reused."""
+    commands = [
+        "--out",
+        str(tmp_path / "out"),
+        "--cachedir",
+        str(tmp_path / "cwltool_cache"),
+        get_data("tests/wf/no-parameters-echo.cwl"),
+    ]
+    error_code, _, stderr = get_main_output(commands)
+    assert error_code == 0, stderr
+    assert "Output of job will be cached in" in stderr
+
+    error_code, _, stderr = get_main_output(commands)
+    assert error_code == 0, stderr
+    assert "Using cached output in" in stderr
+
+    shutil.rmtree(tmp_path / "cwltool_cache")
+    error_code, _, stderr = get_main_output(commands)
+    assert error_code == 0, stderr
+    assert "Output of job will be cached in" in stderr
+
+
+def test_compute_cachekey() -> None:
+    """Confirm the streamed cache key matches hashing the whole serialization."""
+    keydict: dict[str, Any] = {
+        "cmdline": ["echo", "h\u00e9llo"],
+        "stdout": "out.txt",
+        "a/input.txt": [12, "sha1$0123"],
+        "EnvVarRequirement": {"envDef": [{"envName": "X", "envValue": "y"}]},
+    }
+    keydictstr = json.dumps(keydict, separators=(",", ":"), sort_keys=True)
+    expected = hashlib.blake2b(keydictstr.encode("utf-8"), digest_size=16).hexdigest()
+    assert compute_cachekey(keydict) == expected
+    assert compute_cachekey({}) == hashlib.blake2b(b"{}", digest_size=16).hexdigest()
+
+
+def test_checksum_input(tmp_path: Path) -> None:
+    """Confirm that remembered input checksums follow changes to the file."""
+    fs_access = StdFsAccess("")
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("hello\n")
+    first: CWLObjectType = {"class": "File", "location": input_file.as_uri()}
+    checksum_input(fs_access, first)
+    assert first["checksum"] == "sha1$f572d396fae9206628714fb2ce00f72e94f2258f"
+    assert first["size"] == 6
+
+    second: CWLObjectType = {"class": "File", "location": input_file.as_uri()}
+    checksum_input(fs_access, second)
+    assert second == first
+
+    input_file.write_text("goodbye\n")
+    third: CWLObjectType = {"class": "File", "location": input_file.as_uri()}
+    checksum_input(fs_access, third)
+    assert third["checksum"] != first["checksum"]
+    assert third["size"] == 8
+
+
+def test_checksum_input_bounded(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Confirm that only the most recently used input checksums are remembered."""
+    monkeypatch.setattr(cwltool.command_line_tool, "_INPUT_CHECKSUMS_MAX", 2)
+    monkeypatch.setattr(cwltool.command_line_tool, "_input_checksums", {})
+    fs_access = StdFsAccess("")
+    for name in ("a", "b", "a", "c"):
+        input_file = tmp_path / f"{name}.txt"
+        input_file.write_text(name)
+        checksum_input(fs_access, {"class": "File", "location": input_file.as_uri()})
+    remembered = [key[0] for key in cwltool.command_line_tool._input_checksums]
+    assert remembered == [str(tmp_path / "a.txt"), str(tmp_path / "c.txt")]
+
+
+def test_glob_with_stat(tmp_path: Path) -> None:
+    """Confirm that glob_with_stat agrees with glob, isfile, isdir and size."""
+    fs_access = StdFsAccess("")
+    (tmp_path / "a.txt").write_text("hello\n")
+    (tmp_path / "b.txt").write_text("goodbye\n")
+    (tmp_path / "c.txt").mkdir()
+    (tmp_path / "d.txt").symlink_to(tmp_path / "a.txt")
+    (tmp_path / "e.txt").symlink_to(tmp_path / "missing")
+    os.mkfifo(tmp_path / "f.txt")
+
+    def expected(g: str) -> tuple[str, Optional[str], Optional[int]]:
+        if fs_access.isfile(g):
+            return (g, "File", fs_access.size(g))
+        if fs_access.isdir(g):
+            return (g, "Directory", None)
+        return (g, None, None)
+
+    pattern = str(tmp_path / "*.txt")
+    matches = fs_access.glob_with_stat(pattern)
+    assert sorted(matches, key=lambda m: m[0]) == sorted(
+        (expected(g) for g in fs_access.glob(pattern)), key=lambda m: m[0]
+    )
+    assert len(matches) == 6
+    assert fs_access.glob_with_stat(str(tmp_path / "a.txt")) == [
+        ((tmp_path / "a.txt").as_uri(), "File", 6)
+    ]
+    assert fs_access.glob_with_stat(str(tmp_path / "c.txt")) == [
+        ((tmp_path / "c.txt").as_uri(), "Directory", None)
+    ]
+    for name in ("e.txt", "f.txt"):
+        assert fs_access.glob_with_stat(str(tmp_path / name)) == [
+            ((tmp_path / name).as_uri(), None, None)
+        ]
+
+
+def test_glob_broken_symlink_output(tmp_path: Path) -> None:
+    """A broken symlink matched by glob must fail the output location check."""
+    error_code, _, stderr = get_main_output(
+        [
+            "--outdir",
+            str(tmp_path / "out"),
+            get_data("tests/glob-broken-symlink.cwl"),
+        ]
+    )
+    stderr = re.sub(r"\s\s+", " ", stderr)
+    assert error_code == 1, stderr
+    assert "Does not exist or is not a Directory" in stderr, stderr
+
+
+def test_glob_literal(tmp_path: Path) -> None:
+    """Confirm that patterns without wildcards match only an existing path."""
+    fs_access = StdFsAccess(str(tmp_path))
+    (tmp_path / "a b.txt").write_text("hello\n")
+    (tmp_path / "broken").symlink_to(tmp_path / "missing")
+    assert fs_access.glob("a b.txt") == [(tmp_path / "a b.txt").as_uri()]
+    assert fs_access.glob((tmp_path / "a b.txt").as_uri()) == [(tmp_path / "a b.txt").as_uri()]
+    assert fs_access.glob("broken") == [(tmp_path / "broken").as_uri()]
+    assert fs_access.glob("missing") == []
+    assert fs_access.glob("a b.txt/") == []
+
+
 def test_write_summary(tmp_path: Path) -> None:
     """Test --write-summary."""
     commands = [
@@ -1,3 +1,8 @@
+import hashlib
+import json
+import os
+import threading
+import time
 import urllib.parse
 from io import BytesIO
 from pathlib import Path
@@ -239,3 +244,167 @@ def test_bytes2str_in_dicts() -> None:
     assert bytes2str_in_dicts({"foo": [b"bar"]}) == {"foo": ["bar"]}
 
     assert bytes2str_in_dicts({"foo": {"foo2": b"bar"}}) == {"foo": {"foo2": "bar"}}
+
+
+def _empty_clt() -> CommandLineTool:
+    loading_context = LoadingContext(
+        {
+            "metadata": {
+                "cwlVersion": INTERNAL_VERSION,
+                "http://commonwl.org/cwltool#original_cwlVersion": INTERNAL_VERSION,
+            }
+        }
+    )
+    return CommandLineTool(
+        cast(
+            CommentedMap,
+            cmap(
+                {
+                    "cwlVersion": INTERNAL_VERSION,
+                    "class": "CommandLineTool",
+                    "inputs": [],
+                    "outputs": [],
+                    "requirements": [],
+                }
+            ),
+        ),
+        loading_context,
+    )
+
+
+class ThreadRecordingFsAccess(StubFsAccess):
+    """Stub fs access object that records which threads open files."""
+
+    def __init__(self, basedir: str) -> None:
+        """Start with no recorded threads."""
+        super().__init__(basedir)
+        self.threads: set[int] = set()
+
+    def open(self, fn: str, mode: str) -> IO[Any]:
+        """open."""
+        self.threads.add(threading.get_ident())
+        return super().open(fn, mode)
+
+
+class ConcurrentThreadRecordingFsAccess(ThreadRecordingFsAccess):
+    """Thread recording stub fs access object that may be used concurrently."""
+
+    concurrent_lookups = True
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_checksum_outputs_threads(monkeypatch: pytest.MonkeyPatch, concurrent: bool) -> None:
+    """Output files are only hashed from other threads if fs_access allows it."""
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    clt = _empty_clt()
+    builder = clt._init_job({}, RuntimeContext())
+    builder.pathmapper = clt.make_path_mapper(
+        builder.files, builder.stagedir, RuntimeContext(), True
+    )
+    builder.outdir = "/var/spool/cwl"
+    output_schema = cast(
+        CWLObjectType,
+        {"type": {"type": "array", "items": "File"}, "outputBinding": {"glob": ["a", "b", "c"]}},
+    )
+    fs_access = ConcurrentThreadRecordingFsAccess("") if concurrent else ThreadRecordingFsAccess("")
+
+    result = cast(
+        list[CWLObjectType],
+        clt.collect_output(
+            output_schema, builder, "keep:ae755cd1b3cff63152ff4200f4dea7e9+52", fs_access
+        ),
+    )
+
+    assert [r["basename"] for r in result] == ["a", "b", "c"]
+    assert all(
+        r["checksum"] == "sha1$%s" % hashlib.sha1(b"aoeu").hexdigest() for r in result  # nosec
+    )
+    if concurrent:
+        assert threading.get_ident() not in fs_access.threads
+    else:
+        assert fs_access.threads == {threading.get_ident()}
+
+
+OUTDIR = "keep:ae755cd1b3cff63152ff4200f4dea7e9+52"
+
+
+class ConcurrentLookupsFsAccess(StubFsAccess):
+    """Stub fs access object with concurrent lookups and some missing files."""
+
+    concurrent_lookups = True
+    instances: list["ConcurrentLookupsFsAccess"] = []
+
+    def __init__(self, basedir: str) -> None:
+        """Start with no recorded lookups."""
+        super().__init__(basedir)
+        self.checked: list[str] = []
+        self.threads: set[int] = set()
+        self.instances.append(self)
+
+    def exists(self, fn: str) -> bool:
+        """exists."""
+        return fn.endswith("/cwl.output.json")
+
+    def open(self, fn: str, mode: str) -> IO[Any]:
+        """Return a cwl.output.json listing six files."""
+        return BytesIO(
+            json.dumps(
+                {"out": [{"class": "File", "location": f"out{i}.txt"} for i in range(6)]}
+            ).encode("utf-8")
+        )
+
+    def isfile(self, fn: str) -> bool:
+        """Files out2 and out4 are missing; out2 takes longer to look up."""
+        self.checked.append(fn)
+        self.threads.add(threading.get_ident())
+        if fn.endswith("/out2.txt"):
+            time.sleep(0.2)
+            return False
+        return not fn.endswith("/out4.txt")
+
+
+def test_concurrent_location_checks() -> None:
+    """Non-local output locations are checked concurrently if fs_access allows it."""
+    clt = _empty_clt()
+    builder = clt._init_job({}, RuntimeContext())
+    builder.pathmapper = clt.make_path_mapper(
+        builder.files, builder.stagedir, RuntimeContext(), True
+    )
+    builder.outdir = "/var/spool/cwl"
+    builder.make_fs_access = ConcurrentLookupsFsAccess
+
+    with pytest.raises(WorkflowException, match="out2.txt") as err:
+        clt.collect_output_ports(set(), builder, OUTDIR, 0, compute_checksum=False)
+    fs_access = ConcurrentLookupsFsAccess.instances[-1]
+
+    # the first missing file in output order is reported, even though
+    # out4.txt was found to be missing first
+    assert "out4.txt" not in str(err.value).splitlines()[0]
+    assert sorted(fs_access.checked) == [f"{OUTDIR}/out{i}.txt" for i in range(6)]
+    assert threading.get_ident() not in fs_access.threads
+
+
+class GlobErrorFsAccess(StubFsAccess):
+    """Stub fs access object whose glob always fails."""
+
+    def glob(self, pattern: str) -> list[str]:
+        """glob."""
+        raise OSError("glob failed")
+
+
+def test_glob_oserror_skips_pattern(caplog: pytest.LogCaptureFixture) -> None:
+    """An OSError from fs_access.glob is logged and the pattern skipped."""
+    clt = _empty_clt()
+    builder = clt._init_job({}, RuntimeContext())
+    builder.pathmapper = clt.make_path_mapper(
+        builder.files, builder.stagedir, RuntimeContext(), True
+    )
+    builder.outdir = "/var/spool/cwl"
+    output_schema = cast(
+        CWLObjectType, {"type": ["null", "File"], "outputBinding": {"glob": "out.txt"}}
+    )
+
+    result = clt.collect_output(output_schema, builder, OUTDIR, GlobErrorFsAccess(""))
+
+    assert result is None
+    assert "glob failed" in caplog.text